@@ -2,9 +2,12 @@ import streamlit as st
 import cv2
 import numpy as np
 import time
+import uuid
 
 
-from modules.vision import analyze_frame
+from modules.vision import analyze_frame, finalize_prediction, load_model
+from modules.serving import DetectorPool, workers_from_env
+from modules.memory import MemoryMonitor, budget_from_env, trace_from_env
 from modules.feedback import trigger_feedback
 from modules.utils import format_confidence
 
@@ -30,6 +33,43 @@ if "demo_mode" not in st.session_state:
     st.session_state.demo_mode = False
 if "_auto_mock" not in st.session_state:
     st.session_state._auto_mock = False
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+
+@st.cache_resource
+def get_detector_pool():
+    """Shared worker pool (DETECTOR_WORKERS > 0), or None for in-process detection."""
+    workers = workers_from_env()
+    if workers > 0:
+        return DetectorPool(workers=workers)  # the UI process never loads the model
+    load_model()  # in-process detection: load the interpreter up front
+    return None
+
+
+detector_pool = get_detector_pool()
+
+
+@st.cache_resource
+def get_memory_monitor():
+    """Process-wide memory accounting (MEMORY_BUDGET_MB / MEMORY_TRACE)."""
+    monitor = MemoryMonitor(budget_mb=budget_from_env(), trace=trace_from_env())
+    if detector_pool is not None:
+        monitor.attach_pool(detector_pool)
+        monitor.record_buffer("pool_ring", detector_pool.slots * detector_pool.slot_bytes)
+    return monitor
+
+
+memory_monitor = get_memory_monitor()
+
+def touch_session():
+    """Mark this session alive and forget sessions whose browser tab has gone away."""
+    for expired in memory_monitor.touch_session(st.session_state.session_id, len(st.session_state)):
+        if detector_pool is not None:
+            detector_pool.forget(expired)
+
+
+touch_session()
 
 # --- Controls ---
 st.subheader("⚙️ Settings")
@@ -159,27 +199,64 @@ with right:
     progress_placeholder = st.empty()
     confidence_placeholder = st.empty()
     info_placeholder = st.empty()
+    memory_placeholder = st.empty()
 
 # Camera loop with live updates
 if st.session_state.camera_running:
     cap = cv2.VideoCapture(0)
 
     try:
+        frame_rgb = None
+        preview_buf = None
+        last_memory_update = 0.0
         while st.session_state.camera_running:
-            ret, frame = cap.read()
+            # Memory budget: shed preview resolution / inference rate under pressure
+            shed = memory_monitor.tick()
+
+            with memory_monitor.stage("capture"):
+                ret, frame = cap.read()
             if not ret:
                 frame_placeholder.error("Failed to read frame.")
                 break
 
-            # Convert and display frame
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_placeholder.image(frame_rgb, channels="RGB", width='stretch')
+            # Convert and display frame (reuse the RGB / preview buffers between iterations)
+            with memory_monitor.stage("preview"):
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+                preview = frame_rgb
+                if shed["preview_scale"] < 1.0:
+                    size = (max(1, int(frame_rgb.shape[1] * shed["preview_scale"])),
+                            max(1, int(frame_rgb.shape[0] * shed["preview_scale"])))
+                    preview_buf = cv2.resize(frame_rgb, size, dst=preview_buf,
+                                             interpolation=cv2.INTER_AREA)
+                    preview = preview_buf
+                else:
+                    preview_buf = None  # pressure gone: give the buffer back
+                frame_placeholder.image(preview, channels="RGB", width='stretch')
+            memory_monitor.record_buffer("frame_bgr", frame)
+            memory_monitor.record_buffer("frame_rgb", frame_rgb)
+            memory_monitor.record_buffer("preview", 0 if preview_buf is None else preview_buf)
 
             # Run detection
             if not mock_mode and not demo_mode:
                 current_time = time.time()
-                if current_time - st.session_state.last_detection_time > 0.5:
-                    result = analyze_frame(frame_rgb)
+                result = None
+                label = st.session_state.label
+                confidence = st.session_state.confidence
+                if detector_pool is not None:
+                    # Multi-process mode: hand the frame to the pool, pick up
+                    # whichever result is ready without blocking the UI.
+                    if current_time - st.session_state.last_detection_time > shed["detect_interval"]:
+                        if detector_pool.submit(st.session_state.session_id, frame_rgb):
+                            st.session_state.last_detection_time = current_time
+                    raw = detector_pool.poll(st.session_state.session_id)
+                    if raw is not None:
+                        result = finalize_prediction(raw["prediction"])
+                elif current_time - st.session_state.last_detection_time > shed["detect_interval"]:
+                    with memory_monitor.stage("detect"):
+                        result = analyze_frame(frame_rgb)
+                    st.session_state.last_detection_time = current_time
+
+                if result is not None:
                     label = result["label"]
                     confidence = result["confidence"]
                     
@@ -196,13 +273,13 @@ if st.session_state.camera_running:
                     
                     st.session_state.label = label
                     st.session_state.confidence = confidence
-                    st.session_state.last_detection_time = current_time
                     
                     # Trigger feedback on label change
                     if label != st.session_state.last_label:
                         print(f"🔔 FEEDBACK TRIGGERED: {label.upper()} (changed from {st.session_state.last_label.upper()})")
-                        trigger_feedback(label, mode)
-                        st.session_state.last_label = label
+                        # A dropped warning keeps last_label so the next detection retries it
+                        if trigger_feedback(label, mode)["status"] != "dropped":
+                            st.session_state.last_label = label
             else:
                 label = st.session_state.label
                 confidence = st.session_state.confidence
@@ -234,6 +311,12 @@ if st.session_state.camera_running:
             else:
                 info_placeholder.empty()
 
+            # Memory footprint (refreshed once per second)
+            if time.time() - last_memory_update > 1.0:
+                touch_session()
+                memory_placeholder.caption(f"🧠 {memory_monitor.summary()}")
+                last_memory_update = time.time()
+
             time.sleep(0.03)  # ~30 FPS
     finally:
         cap.release()
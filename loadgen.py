@@ -0,0 +1,110 @@
+# loadgen.py
+# Load generator for the multi-process serving mode (modules/serving.py).
+# Simulates N concurrent sessions, each submitting a frame and waiting for its
+# result (closed loop), and prints throughput/latency for every N.
+#
+#   python loadgen.py --workers 4 --sessions 1 2 4 8 --duration 10
+#   python loadgen.py --workers 0 ...   # in-process baseline (shared GIL)
+
+from __future__ import annotations
+
+import os
+import glob
+import time
+import argparse
+import threading
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from modules.serving import DetectorPool
+
+
+def _load_frames(width: int, height: int) -> List[np.ndarray]:
+    """Demo images resized to camera resolution; random noise if none found."""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "assets", "demo_images", "*"))):
+        img = cv2.imread(path)
+        if img is not None:
+            frames.append(cv2.cvtColor(cv2.resize(img, (width, height)), cv2.COLOR_BGR2RGB))
+    if not frames:
+        frames = [np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)]
+    return frames
+
+
+def _run_sessions(n: int, duration: float, frames: List[np.ndarray], pool) -> Dict[str, float]:
+    latencies: List[float] = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    if pool is None:
+        from modules import vision
+        vision.load_model()
+        infer_lock = threading.Lock()  # one interpreter per process
+
+    def session(idx: int) -> None:
+        sid = f"loadgen-{idx}"
+        i = idx
+        while time.perf_counter() < stop_at:
+            frame = frames[i % len(frames)]
+            i += 1
+            t0 = time.perf_counter()
+            if pool is None:
+                with infer_lock:
+                    vision._predict(frame)
+            else:
+                if not pool.submit(sid, frame):
+                    time.sleep(0.001)
+                    continue
+                if pool.poll(sid, timeout=10.0) is None:
+                    continue
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    threads = [threading.Thread(target=session, args=(k,)) for k in range(n)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "fps": len(latencies) / elapsed,
+        "p50": float(np.percentile(lat, 50)),
+        "p95": float(np.percentile(lat, 95)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate concurrent detection sessions.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="detector processes (0 = in-process baseline)")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    frames = _load_frames(args.width, args.height)
+    pool = DetectorPool(workers=args.workers) if args.workers > 0 else None
+
+    try:
+        if pool is not None:
+            # Warm-up: every worker loads its own model before timing starts
+            pool.wait_ready(timeout=120.0)
+
+        print(f"\nworkers={args.workers or 'in-process'}  frame={args.width}x{args.height}")
+        print(f"{'sessions':>8} {'frames/s':>10} {'p50 ms':>9} {'p95 ms':>9}")
+        for n in args.sessions:
+            r = _run_sessions(n, args.duration, frames, pool)
+            print(f"{n:>8} {r['fps']:>10.1f} {r['p50']:>9.1f} {r['p95']:>9.1f}")
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 import pyttsx3
+import queue
 import threading
 import time
 
 # --- CONFIGURATION ---
 COOLDOWN_SECONDS = 3.0  # Wait 3s before repeating the SAME warning
+SPEECH_TIMEOUT = 10.0   # An utterance running longer than this = TTS engine hung
 _last_triggered_time = 0
 _last_triggered_label = None
 
+# One long-lived speech thread; at most one message waits behind the one
+# being spoken, and a newer warning replaces it instead of queueing up.
+# _speaker = {"thread", "queue", "started"}; replaced if it dies or hangs.
+_speech_lock = threading.Lock()
+_speaker = None
+
 def build_feedback(label: str):
     """
     Maps labels to messages + simulated vibration patterns.
@@ -32,6 +40,50 @@ def _speak_worker(text):
     except:
         pass # Fail silently if audio driver is busy
 
+def _speech_loop(speaker):
+    while True:
+        text = speaker["queue"].get()
+        speaker["started"] = time.time()
+        try:
+            _speak_worker(text)
+        finally:
+            speaker["started"] = None
+
+def _new_speaker():
+    speaker = {"queue": queue.Queue(maxsize=1), "started": None}
+    speaker["thread"] = threading.Thread(target=_speech_loop, args=(speaker,),
+                                         name="feedback-tts", daemon=True)
+    speaker["thread"].start()
+    return speaker
+
+def _speak(text) -> bool:
+    """
+    Hand text to the speech thread (started on first use / if it died).
+    Replaces any message still waiting, so the newest warning always wins.
+    Returns False if the text will not be spoken.
+    """
+    global _speaker
+    with _speech_lock:
+        try:
+            if _speaker is None or not _speaker["thread"].is_alive():
+                _speaker = _new_speaker()
+
+            started = _speaker["started"]
+            if started is not None and time.time() - started > SPEECH_TIMEOUT:
+                # runAndWait() hung (known pyttsx3 failure): abandon that thread
+                # and report this warning as not spoken so the caller retries
+                _speaker = _new_speaker()
+                return False
+
+            try:
+                _speaker["queue"].get_nowait()  # drop the stale pending message
+            except queue.Empty:
+                pass
+            _speaker["queue"].put_nowait(text)
+            return True
+        except Exception:
+            return False
+
 def trigger_feedback(label: str, mode: str):
     """
     Triggers multimodal feedback with Anti-Spam (Cooldown) logic.
@@ -55,13 +107,14 @@ def trigger_feedback(label: str, mode: str):
             return {"status": "cooldown", "message": fb["message"], "pattern": []}
 
     # 3. If we pass the checks, TRIGGER the feedback
+    # Audio Trigger (single speech thread, newest message wins)
+    if "Sound" in mode and fb["message"] and not _speak(fb["message"]):
+        # Not spoken: leave the cooldown untouched so the next call retries
+        return {"status": "dropped", "message": fb["message"], "pattern": []}
+
     _last_triggered_label = label
     _last_triggered_time = current_time
 
-    # Audio Trigger (Threaded)
-    if "Sound" in mode and fb["message"]:
-        threading.Thread(target=_speak_worker, args=(fb["message"],)).start()
-
     # Return data for UI visualization (Role 2)
     return {
         "status": "triggered",
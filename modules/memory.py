@@ -0,0 +1,306 @@
+# modules/memory.py
+# Memory accounting + budget-based load shedding for long-running sessions.
+# Tracks: process RSS (plus the unique memory - USS - of detector worker
+# processes when a DetectorPool is attached), per-stage tracemalloc deltas, frame buffer sizes, live threads /
+# sessions and the TFLite interpreter arenas (modules.vision).
+#
+# UI usage:
+#   monitor = MemoryMonitor(budget_mb=budget_from_env())
+#   monitor.attach_pool(detector_pool)   # optional, modules/serving.py
+#   with monitor.stage("detect"): ...
+#   monitor.record_buffer("frame_rgb", frame_rgb)
+#   policy = monitor.tick()   # {"level", "preview_scale", "detect_interval"}
+#
+# Env overrides: MEMORY_BUDGET_MB=<MB> (0 / unset = no shedding; needs psutil),
+#                MEMORY_TRACE=1 (per-stage tracemalloc accounting, logged
+#                every TRACE_LOG_INTERVAL seconds).
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("memory")
+
+try:
+    import psutil  # type: ignore
+except Exception:
+    psutil = None  # type: ignore
+
+# --- CONFIGURATION ---
+SAMPLE_INTERVAL = 1.0       # seconds between RSS samples
+TRACE_LOG_INTERVAL = 60.0   # seconds between per-stage growth logs (MEMORY_TRACE)
+SESSION_TIMEOUT = 60.0      # a session not seen for this long is considered gone
+SOFT_LIMIT = 0.80           # fraction of budget -> shed level 1
+HARD_LIMIT = 0.95           # fraction of budget -> shed level 2
+RECOVER_MARGIN = 0.10       # drop a level only once this far below its limit
+LEVEL_LIMITS = {1: SOFT_LIMIT, 2: HARD_LIMIT}
+
+# Shed levels: what the camera loop should do at each level of pressure.
+SHED_POLICY = {
+    0: {"level": 0, "preview_scale": 1.0,  "detect_interval": 0.5},
+    1: {"level": 1, "preview_scale": 0.5,  "detect_interval": 1.0},
+    2: {"level": 2, "preview_scale": 0.25, "detect_interval": 2.0},
+}
+
+
+def budget_from_env() -> float:
+    """Memory budget in MB from MEMORY_BUDGET_MB (0 = unlimited)."""
+    try:
+        return max(0.0, float(os.getenv("MEMORY_BUDGET_MB", "0").strip() or 0))
+    except ValueError:
+        return 0.0
+
+
+def trace_from_env() -> bool:
+    return str(os.getenv("MEMORY_TRACE", "")).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """
+    Current resident set size of this process, or of `pid` (psutil, else
+    /proc on Linux). None when no live reading is available.
+    """
+    if psutil is not None:
+        try:
+            return int(psutil.Process(pid).memory_info().rss)
+        except Exception:
+            pass
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def uss_bytes(pid: int) -> Optional[int]:
+    """
+    Memory unique to `pid` (USS). Used for detector workers: their RSS
+    repeats the shared TensorFlow pages and the frame ring, which the UI
+    process's RSS already counts. Falls back to RSS if USS is unreadable.
+    """
+    if psutil is not None:
+        try:
+            return int(psutil.Process(pid).memory_full_info().uss)
+        except Exception:
+            pass
+    return rss_bytes(pid)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Lifetime peak RSS of this process (reporting only - it never goes down)."""
+    try:
+        import resource
+    except Exception:
+        return None  # Windows
+    peak = int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    # ru_maxrss is bytes on macOS, KB on Linux/BSD
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def shed_level(usage: float, current: int) -> int:
+    """
+    Next shed level for `usage` (fraction of budget). Rises immediately;
+    each level is cleared only once usage is RECOVER_MARGIN below its
+    limit, so a large drop can clear several levels in one call.
+    """
+    target = 2 if usage >= HARD_LIMIT else 1 if usage >= SOFT_LIMIT else 0
+    if target >= current:
+        return target
+
+    level = current
+    while level > target and usage < LEVEL_LIMITS[level] - RECOVER_MARGIN:
+        level -= 1
+    return level
+
+
+def _mb(n: float) -> float:
+    return n / (1024 * 1024)
+
+
+class MemoryMonitor:
+    """
+    Process-wide memory accounting. One instance is shared by every
+    Streamlit session (all sessions live in the same process).
+    """
+
+    def __init__(self, budget_mb: float = 0.0, trace: bool = False):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.trace = trace
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._buffers: Dict[str, int] = {}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._last_trace_log = time.time()
+
+        if self.budget_bytes and psutil is None:
+            logger.warning("MEMORY_BUDGET_MB needs psutil (pip install psutil) — load shedding disabled")
+            self.budget_bytes = 0
+
+        self._pool = None
+        self._ui_rss = rss_bytes()
+        self._workers_uss = 0
+        self._rss = self._ui_rss
+        self._peak_rss = self._rss or 0
+        self._last_sample = time.time()
+        self._level = 0
+
+    def attach_pool(self, pool) -> None:
+        """Count a DetectorPool's worker processes (by USS) toward the budget."""
+        self._pool = pool
+
+    # -- accounting -----------------------------------------------------------
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Accumulate the traced memory a stage leaves behind (MEMORY_TRACE only).
+        `net_total` growing across calls means the stage is retaining memory.
+        Stages may nest and run concurrently; tracemalloc's counter is
+        process-wide, so with several live sessions a stage's figures also
+        include the other sessions' allocations - trace one session for
+        exact per-stage numbers.
+        """
+        if not self.trace:
+            yield
+            return
+
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            net = tracemalloc.get_traced_memory()[0] - before
+            with self._lock:
+                s = self._stages.setdefault(name, {"calls": 0, "net_total": 0, "net_last": 0})
+                s["calls"] += 1
+                s["net_total"] += net
+                s["net_last"] = net
+
+    def record_buffer(self, name: str, array) -> None:
+        """Track the size of a named frame buffer (numpy array or raw byte count)."""
+        nbytes = array if isinstance(array, int) else int(getattr(array, "nbytes", 0))
+        with self._lock:
+            self._buffers[name] = nbytes
+
+    def touch_session(self, session_id: str, state_keys: int = 0) -> List[str]:
+        """Mark a session alive. Returns ids of sessions that have timed out."""
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = {"seen": now, "state_keys": state_keys}
+            expired = [sid for sid, s in self._sessions.items()
+                       if now - s["seen"] > SESSION_TIMEOUT]
+            for sid in expired:
+                del self._sessions[sid]
+        return expired
+
+    # -- budget ---------------------------------------------------------------
+
+    def tick(self) -> Dict[str, Any]:
+        """Sample RSS (at most once per SAMPLE_INTERVAL) and return the shed policy."""
+        now = time.time()
+        with self._lock:
+            # one session takes the sample; the others use the current level
+            due = now - self._last_sample >= SAMPLE_INTERVAL
+            if not due:
+                return SHED_POLICY[self._level]
+            self._last_sample = now
+
+        ui_rss = rss_bytes()
+        pids = self._pool.worker_pids() if self._pool is not None else []
+        workers_uss = sum(uss_bytes(pid) or 0 for pid in pids)
+
+        with self._lock:
+            self._ui_rss = ui_rss
+            self._workers_uss = workers_uss
+            if ui_rss is None:
+                self._rss = None
+            else:
+                self._rss = ui_rss + workers_uss
+                self._peak_rss = max(self._peak_rss, self._rss)
+            self._update_level()
+            level = self._level
+            log_stages = self.trace and now - self._last_trace_log >= TRACE_LOG_INTERVAL
+            if log_stages:
+                self._last_trace_log = now
+
+        if log_stages:
+            self._log_stages()
+        return SHED_POLICY[level]
+
+    def _update_level(self) -> None:
+        # caller holds self._lock
+        if self.budget_bytes <= 0:
+            self._level = 0
+            return
+        if self._rss is None:
+            logger.warning("No live RSS reading on this platform — load shedding disabled")
+            self.budget_bytes = 0
+            self._level = 0
+            return
+
+        level = shed_level(self._rss / self.budget_bytes, self._level)
+        if level != self._level:
+            logger.warning(f"Memory {_mb(self._rss):.0f}/{_mb(self.budget_bytes):.0f} MB "
+                           f"— shed level {self._level} -> {level}")
+            self._level = level
+
+    # -- reporting ------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of every tracked figure (bytes unless noted)."""
+        try:
+            from modules import vision
+            ui_interpreter = dict(vision.interpreter_stats)
+        except Exception:
+            ui_interpreter = {}
+        workers = self._pool.worker_interpreter_stats() if self._pool is not None else []
+        interpreter = {
+            "ui": ui_interpreter,
+            "workers": workers,
+            "arena_bytes": sum(i.get("arena_bytes", 0) for i in [ui_interpreter] + workers),
+        }
+
+        with self._lock:
+            return {
+                "rss": self._rss,
+                "ui_rss": self._ui_rss,
+                "workers_uss": self._workers_uss,
+                "peak_rss": self._peak_rss or peak_rss_bytes(),
+                "budget": self.budget_bytes,
+                "shed_level": self._level,
+                "threads": threading.active_count(),
+                "feedback_threads": sum(1 for t in threading.enumerate()
+                                        if t.name.startswith("feedback-")),
+                "sessions": len(self._sessions),
+                "buffers": dict(self._buffers),
+                "stages": {k: dict(v) for k, v in self._stages.items()},
+                "interpreter": interpreter,
+                "traced": tracemalloc.get_traced_memory()[0] if self.trace else None,
+            }
+
+    def _log_stages(self) -> None:
+        with self._lock:
+            stages = {k: dict(v) for k, v in self._stages.items()}
+        for name, s in sorted(stages.items()):
+            logger.info(f"Stage '{name}': {s['calls']} calls, net {_mb(s['net_total']):+.2f} MB "
+                        f"(last {s['net_last'] / 1024:+.1f} KB)")
+
+    def summary(self) -> str:
+        s = self.stats()
+        budget = f"/{_mb(s['budget']):.0f}" if s["budget"] else ""
+        buffers = sum(s["buffers"].values())
+        arena = s["interpreter"]["arena_bytes"]
+        workers = f" (workers {_mb(s['workers_uss']):.0f} USS)" if self._pool is not None else ""
+        rss = f"{_mb(s['rss']):.0f}" if s["rss"] is not None else "n/a"
+        return (f"RSS {rss}{budget} MB{workers} · frames {_mb(buffers):.1f} MB · "
+                f"arena {_mb(arena):.1f} MB · threads {s['threads']} · "
+                f"sessions {s['sessions']} · shed L{s['shed_level']}")
@@ -0,0 +1,406 @@
+# modules/serving.py
+# Optional multi-process serving mode.
+# The TFLite detector runs in a pool of worker processes so inference does not
+# compete with the Streamlit server for the GIL. Frames travel through a
+# multiprocessing.shared_memory ring buffer (no pickling of pixel data); only
+# small (slot, shape) tickets and results go over per-worker pipes.
+#
+# UI usage:
+#   pool = DetectorPool(workers=4)
+#   pool.submit(session_id, frame_rgb)      # non-blocking, False if ring is full
+#   raw = pool.poll(session_id)             # None until a result arrives
+#   result = finalize_prediction(raw["prediction"])
+#
+# Each worker has its own task/result pipes, so a crashed worker cannot leave a
+# shared queue lock held. It is restarted and the slots it held are reclaimed;
+# requests that never come back (crash or RESULT_TIMEOUT) are answered with
+# prediction=None so the UI goes through vision._handle_failure() and its
+# auto-mock fallback.
+
+from __future__ import annotations
+
+import os
+import time
+import atexit
+import logging
+import threading
+import multiprocessing as mp
+from multiprocessing import connection, shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("serving")
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
+try:
+    import cv2  # type: ignore
+except Exception:
+    cv2 = None  # type: ignore
+
+# --- CONFIGURATION ---
+DEFAULT_SLOTS = 8                   # frames in flight across all sessions
+DEFAULT_MAX_SHAPE = (720, 1280, 3)  # largest frame a slot can hold (H, W, C); bigger ones are downscaled
+RESULT_TIMEOUT = 5.0                # seconds before an unanswered frame counts as failed
+HEALTH_INTERVAL = 0.5               # seconds between worker liveness checks
+
+
+def workers_from_env() -> int:
+    """Worker count from DETECTOR_WORKERS (0 / unset = in-process detection)."""
+    try:
+        return max(0, int(os.getenv("DETECTOR_WORKERS", "0").strip() or 0))
+    except ValueError:
+        return 0
+
+
+# Worker process ---------------------------------------------------------------
+
+def _worker_main(index: int, shm_name: str, slot_bytes: int, tasks, results) -> None:
+    """
+    Runs in a child process. Loads its own TFLite interpreter (via the
+    modules.vision import) and serves tickets until it receives None.
+    Slots are handed back by the parent when the result arrives.
+    """
+    from modules import vision
+    vision.load_model()
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    results.send((None, {"ready": index, "interpreter": dict(vision.interpreter_stats)}))
+    try:
+        while True:
+            try:
+                task = tasks.recv()
+            except EOFError:
+                break  # parent went away
+            if task is None:
+                break
+
+            ticket, slot, shape = task
+            started = time.perf_counter()
+            try:
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf,
+                                   offset=slot * slot_bytes)
+                prediction = vision._predict(frame)
+                del frame  # drop the view before the slot is reused
+            except Exception as e:
+                logger.error(f"Worker inference failed: {e}")
+                prediction = None
+
+            results.send((ticket, {
+                "prediction": prediction,
+                "infer_ms": (time.perf_counter() - started) * 1000.0,
+                "worker": os.getpid(),
+            }))
+    finally:
+        shm.close()
+
+
+# UI-side pool ----------------------------------------------------------------
+
+class DetectorPool:
+    """
+    Pool of detector processes fed from a shared-memory frame ring.
+    One instance is shared by every Streamlit session; results are routed
+    back per session_id by a collector thread.
+    """
+
+    def __init__(self, workers: int = 2, slots: int = DEFAULT_SLOTS,
+                 max_shape: Tuple[int, int, int] = DEFAULT_MAX_SHAPE):
+        if np is None:
+            raise RuntimeError("numpy is required for the multi-process serving mode")
+
+        self.workers = max(1, int(workers))
+        self.slots = max(1, int(slots))
+        self.max_shape = tuple(max_shape)
+        self.slot_bytes = int(np.prod(self.max_shape))
+
+        self._cond = threading.Condition()
+        self._free_slots: List[int] = list(range(self.slots))
+        # ticket -> {"session", "slot", "worker", "submitted", "answered"}
+        self._tickets: Dict[int, Dict[str, Any]] = {}
+        self._next_ticket = 0
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._ready: set = set()
+        self._interpreter_stats: Dict[int, Dict[str, int]] = {}
+        self._closed = False
+        self._warned_resize = False
+        self._health_lock = threading.Lock()
+        self._last_health = time.perf_counter()
+
+        # spawn: never fork a process that already initialised TensorFlow
+        self._ctx = mp.get_context("spawn")
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self._tasks: List[Any] = [None] * self.workers    # parent -> worker k
+        self._results: List[Any] = [None] * self.workers  # worker k -> parent
+        self._retired: List[Any] = []  # replaced result pipes, closed by the collector
+        self._procs = [self._spawn(k) for k in range(self.workers)]
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+        atexit.register(self.close)
+        logger.info(f"DetectorPool started: {self.workers} workers, "
+                    f"{self.slots} slots x {self.slot_bytes / 1e6:.1f} MB")
+
+    def _spawn(self, index: int):
+        """Start worker `index` on a fresh pair of pipes (caller replaces self._procs[index])."""
+        task_r, task_w = self._ctx.Pipe(duplex=False)
+        result_r, result_w = self._ctx.Pipe(duplex=False)
+        p = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self._shm.name, self.slot_bytes, task_r, result_w),
+            daemon=True,
+        )
+        p.start()
+        task_r.close()
+        result_w.close()
+        with self._cond:
+            self._tasks[index] = task_w
+            self._results[index] = result_r
+        return p
+
+    # -- frame transport ------------------------------------------------------
+
+    def submit(self, session_id: str, frame) -> bool:
+        """
+        Copy frame into a free ring slot and queue it for inference.
+        Frames larger than a slot are downscaled into it (the model input is
+        far smaller anyway). Never blocks: returns False (frame dropped) when
+        every slot is busy.
+        """
+        if self._closed:
+            return False
+        self._check_workers()
+
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        shape, step = self._fit_shape(frame.shape)
+
+        with self._cond:
+            if not self._free_slots:
+                return False  # back-pressure: all slots in flight
+            slot = self._free_slots.pop()
+
+        view = np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf,
+                          offset=slot * self.slot_bytes)
+        if shape == frame.shape:
+            view[...] = frame
+        elif cv2 is not None:
+            cv2.resize(frame, (shape[1], shape[0]), dst=view, interpolation=cv2.INTER_AREA)
+        else:
+            view[...] = frame[::step, ::step]
+        del view
+
+        with self._cond:
+            # least-loaded worker
+            load = [0] * self.workers
+            for t in self._tickets.values():
+                load[t["worker"]] += 1
+            worker = load.index(min(load))
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._tickets[ticket] = {"session": session_id, "slot": slot, "worker": worker,
+                                     "submitted": time.perf_counter(), "answered": False}
+            try:
+                self._tasks[worker].send((ticket, slot, shape))
+            except OSError:
+                pass  # worker just died; _check_workers() reclaims the ticket
+        return True
+
+    def _fit_shape(self, shape) -> Tuple[Tuple[int, ...], int]:
+        """
+        Shape the frame is stored at so it fits in one slot, plus the stride
+        used when cv2 is unavailable (1 = store as-is).
+        """
+        if int(np.prod(shape)) <= self.slot_bytes:
+            return tuple(shape), 1
+
+        h, w = shape[0], shape[1]
+        rest = tuple(shape[2:])
+        channels = int(np.prod(rest)) if rest else 1
+        fits = lambda fh, fw: (fh <= self.max_shape[0] and fw <= self.max_shape[1]
+                               and fh * fw * channels <= self.slot_bytes)
+
+        if cv2 is not None:
+            scale = min(self.max_shape[0] / h, self.max_shape[1] / w,
+                        (self.slot_bytes / (h * w * channels)) ** 0.5)
+            fitted, step = (max(1, int(h * scale)), max(1, int(w * scale))), 1
+        else:
+            step = 2
+            while not fits(-(-h // step), -(-w // step)):
+                step += 1
+            fitted = (-(-h // step), -(-w // step))
+
+        if not self._warned_resize:
+            logger.warning(f"Frame {tuple(shape)} exceeds slot size {self.max_shape} — "
+                           f"downscaling to {fitted} before inference")
+            self._warned_resize = True
+        return fitted + rest, step
+
+    def _collect(self) -> None:
+        """Route worker results to their session (runs on a daemon thread)."""
+        broken: set = set()  # readers at EOF, skipped until their worker is replaced
+        while not self._closed:
+            with self._cond:
+                # Only this thread waits on result pipes, so only it closes them
+                for conn in self._retired:
+                    conn.close()
+                self._retired.clear()
+                broken &= set(self._results)
+                readers = [r for r in self._results if r not in broken]
+            try:
+                # Timeout so pipes replaced after a restart are picked up
+                ready = connection.wait(readers, timeout=HEALTH_INTERVAL)
+            except (OSError, ValueError):
+                continue  # a pipe changed under us; take a fresh snapshot
+            for reader in ready:
+                try:
+                    ticket, payload = reader.recv()
+                except Exception:
+                    broken.add(reader)  # worker died; _check_workers() replaces it
+                    continue
+                self._route(ticket, payload)
+
+    def _route(self, ticket: Optional[int], payload: Dict[str, Any]) -> None:
+        with self._cond:
+            if ticket is None:  # worker finished loading its model
+                self._ready.add(payload["ready"])
+                self._interpreter_stats[payload["ready"]] = payload.get("interpreter", {})
+                self._cond.notify_all()
+                return
+
+            t = self._tickets.pop(ticket, None)
+            if t is None:  # already reclaimed after a worker crash
+                return
+            self._free_slots.append(t["slot"])
+            if not t["answered"]:  # else timed out or session forgotten
+                self._answer(ticket, t, payload)
+
+    def _answer(self, ticket: int, t: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        """Deliver a result to the ticket's session (caller holds self._cond)."""
+        t["answered"] = True
+        payload["ticket"] = ticket
+        payload["submitted"] = t["submitted"]
+        payload["latency_ms"] = (time.perf_counter() - t["submitted"]) * 1000.0
+        self._latest[t["session"]] = payload
+        self._cond.notify_all()
+
+    def _fail(self, ticket: int, t: Dict[str, Any], reason: str) -> None:
+        self._answer(ticket, t, {"prediction": None, "infer_ms": 0.0,
+                                 "worker": None, "error": reason})
+
+    def _check_workers(self) -> None:
+        """
+        Restart dead workers, reclaim the slots queued to them and fail
+        requests that have waited longer than RESULT_TIMEOUT.
+        Rate-limited to HEALTH_INTERVAL; safe to call from any session thread.
+        """
+        now = time.perf_counter()
+        if self._closed or now - self._last_health < HEALTH_INTERVAL:
+            return
+        if not self._health_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_health = now
+            for k, p in enumerate(self._procs):
+                if p.is_alive():
+                    continue
+                logger.error(f"Detector worker {p.pid} died (exit code {p.exitcode}) — restarting")
+                with self._cond:
+                    self._ready.discard(k)
+                    self._interpreter_stats.pop(k, None)
+                    for ticket, t in list(self._tickets.items()):
+                        if t["worker"] != k:
+                            continue
+                        del self._tickets[ticket]
+                        self._free_slots.append(t["slot"])
+                        if not t["answered"]:
+                            self._fail(ticket, t, "worker died")
+                    self._tasks[k].close()
+                    self._retired.append(self._results[k])
+                self._procs[k] = self._spawn(k)
+
+            with self._cond:
+                for ticket, t in self._tickets.items():
+                    if not t["answered"] and now - t["submitted"] > RESULT_TIMEOUT:
+                        logger.warning(f"Detection result timed out after {RESULT_TIMEOUT:.1f}s")
+                        self._fail(ticket, t, "timeout")
+        finally:
+            self._health_lock.release()
+
+    # -- results --------------------------------------------------------------
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every worker has loaded its interpreter."""
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self._ready) >= self.workers or self._closed, timeout)
+
+    def poll(self, session_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Pop the newest result for session_id. Returns None immediately when
+        nothing is ready, unless timeout is given (then waits up to timeout).
+        """
+        self._check_workers()
+        deadline = time.perf_counter() + (timeout or 0.0)
+        with self._cond:
+            while session_id not in self._latest and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                # Wake up periodically so a dead worker is noticed while waiting
+                self._cond.wait(min(remaining, HEALTH_INTERVAL))
+                self._cond.release()
+                try:
+                    self._check_workers()
+                finally:
+                    self._cond.acquire()
+            return self._latest.pop(session_id, None)
+
+    def forget(self, session_id: str) -> None:
+        """Drop any pending result / in-flight request for a session that has gone away."""
+        with self._cond:
+            self._latest.pop(session_id, None)
+            for t in self._tickets.values():
+                if t["session"] == session_id:
+                    t["answered"] = True
+
+    # -- footprint (read by modules/memory.py) ---------------------------------
+
+    def worker_pids(self) -> List[int]:
+        return [p.pid for p in self._procs if p.is_alive()]
+
+    def worker_interpreter_stats(self) -> List[Dict[str, int]]:
+        """vision.interpreter_stats reported by each worker once its model loaded."""
+        with self._cond:
+            return [dict(v) for v in self._interpreter_stats.values()]
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+
+        for k, p in enumerate(self._procs):
+            try:
+                self._tasks[k].send(None)
+            except Exception:
+                pass
+        for p in self._procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+
+        self._collector.join(timeout=5)
+        with self._cond:
+            for conn in self._tasks + self._results + self._retired:
+                conn.close()
+            self._cond.notify_all()
+
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except Exception:
+            pass
+        logger.info("DetectorPool stopped")
@@ -7,6 +7,7 @@ from __future__ import annotations
 
 import os
 import logging
+import threading
 from typing import Any, Dict, List
 from collections import deque
 
@@ -25,21 +26,20 @@ try:
 except Exception:
     cv2 = None  # type: ignore
 
-# TensorFlow Lite imports
-try:
-    import tensorflow as tf  # type: ignore
-    Interpreter = tf.lite.Interpreter
-except Exception:
-    tf = None  # type: ignore
-    Interpreter = None  # type: ignore
-    logger.warning("TensorFlow not available")
-
 # --- TFLite Model Loading ---
+# TensorFlow is imported and the model loaded lazily (load_model()), so
+# processes that only smooth results - e.g. the UI when detection runs in
+# modules/serving.py workers - never pay for an interpreter.
+_model_lock = threading.Lock()
+_model_loaded = False
 _interpreter = None
 _labels = []
 _input_details = None
 _output_details = None
 
+# Interpreter memory footprint (read by modules/memory.py)
+interpreter_stats = {"arena_bytes": 0, "tensor_bytes": 0}
+
 # Label mapping: model labels → app labels
 MODEL_TO_APP = {
     "0 no stairs": "clear",
@@ -51,11 +51,24 @@ latest_result = {"label": "clear", "confidence": 0.0}
 _last_detection_time = 0
 _detection_throttle = 0.5  # seconds between detections
 
+def load_model():
+    """Load the TFLite model once (thread-safe). Called on first prediction."""
+    global _model_loaded
+    with _model_lock:
+        if not _model_loaded:
+            _model_loaded = True
+            _load_model()
+
 def _load_model():
-    """Load TFLite model and labels at module import time."""
+    """Load TFLite model and labels."""
     global _interpreter, _labels, _input_details, _output_details
-    
-    if Interpreter is None:
+
+    # TensorFlow Lite imports
+    try:
+        import tensorflow as tf  # type: ignore
+        Interpreter = tf.lite.Interpreter
+    except Exception:
+        logger.warning("TensorFlow not available")
         logger.warning("TFLite Interpreter not available - skipping model load")
         return
     
@@ -68,8 +81,26 @@ def _load_model():
             logger.warning(f"Model not found at: {model_path}")
             return
         
+        from modules.memory import rss_bytes
+
         _interpreter = Interpreter(model_path=model_path)
+        rss_before = rss_bytes()
         _interpreter.allocate_tensors()
+
+        # TFLite does not expose the arena size; use the RSS growth across
+        # allocate_tensors() and the summed tensor sizes as a cross-check.
+        rss_after = rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            interpreter_stats["arena_bytes"] = max(0, rss_after - rss_before)
+        try:
+            interpreter_stats["tensor_bytes"] = sum(
+                int(np.prod(t["shape"])) * np.dtype(t["dtype"]).itemsize
+                for t in _interpreter.get_tensor_details()
+            ) if np is not None else 0
+        except Exception:
+            interpreter_stats["tensor_bytes"] = 0
+        logger.info(f"Interpreter arena: {interpreter_stats['arena_bytes'] / 1e6:.1f} MB "
+                    f"(tensors {interpreter_stats['tensor_bytes'] / 1e6:.1f} MB)")
         
         _input_details = _interpreter.get_input_details()
         _output_details = _interpreter.get_output_details()
@@ -116,7 +147,8 @@ def _predict(frame):
     Returns: {"label": str, "confidence": float} or None if prediction fails.
     """
     global _interpreter, _labels, _input_details, _output_details
-    
+
+    load_model()
     if _interpreter is None or np is None or cv2 is None:
         return None
     
@@ -176,8 +208,6 @@ def _predict(frame):
         logger.error(f"TFLite prediction failed: {e}")
         return None
 
-# Load model on module import
-_load_model()
 
 # --- Confidence Smoothing & Anti-Flicker ---
 _label_history: deque = deque(maxlen=5)   # last 5 labels
@@ -312,24 +342,31 @@ def analyze_frame(frame=None) -> dict:
             return _handle_failure()
 
         # Run TFLite model prediction
-        result = _predict(img)
-        
-        if result is None:
-            logger.warning("Model prediction failed")
-            return _handle_failure()
-        
-        label = result["label"]
-        confidence = result["confidence"]
-        
-        # Apply confidence threshold
-        if confidence < 0.6:
-            logger.debug(f"Low confidence ({confidence:.2f}) - treating as clear")
-            return _smooth_result("clear", 0.0)
-        
-        # High confidence - use predicted label
-        logger.debug(f"Prediction: {label} ({confidence:.2f})")
-        return _smooth_result(label, confidence)
+        return finalize_prediction(_predict(img))
 
     except Exception as e:
         logger.error(f"Detection exception: {e}")
         return _handle_failure()
+
+
+def finalize_prediction(result) -> dict:
+    """
+    Apply the confidence threshold + temporal smoothing to a raw _predict()
+    result. Split out so predictions computed elsewhere (e.g. the worker
+    pool in modules/serving.py) share the same UI-side smoothing state.
+    """
+    if result is None:
+        logger.warning("Model prediction failed")
+        return _handle_failure()
+
+    label = result["label"]
+    confidence = result["confidence"]
+
+    # Apply confidence threshold
+    if confidence < 0.6:
+        logger.debug(f"Low confidence ({confidence:.2f}) - treating as clear")
+        return _smooth_result("clear", 0.0)
+
+    # High confidence - use predicted label
+    logger.debug(f"Prediction: {label} ({confidence:.2f})")
+    return _smooth_result(label, confidence)
@@ -0,0 +1,76 @@
+import importlib
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+
+class _Engine:
+    def __init__(self, tts):
+        self.tts = tts
+
+    def setProperty(self, *args):
+        pass
+
+    def say(self, text):
+        self.tts.spoken.append(text)
+
+    def runAndWait(self):
+        self.tts.gate.wait(10)
+
+
+@pytest.fixture
+def feedback(monkeypatch):
+    """modules.feedback on a stub pyttsx3 whose runAndWait() blocks until gate is set."""
+    tts = types.SimpleNamespace(spoken=[], gate=threading.Event())
+    tts.init = lambda: _Engine(tts)
+    monkeypatch.setitem(sys.modules, "pyttsx3", tts)
+    sys.modules.pop("modules.feedback", None)
+    module = importlib.import_module("modules.feedback")
+    module.tts = tts
+    yield module
+    tts.gate.set()
+    sys.modules.pop("modules.feedback", None)
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.time() + timeout
+    while not cond() and time.time() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_newest_warning_replaces_the_pending_one(feedback):
+    assert feedback.trigger_feedback("step", "Sound Only")["status"] == "triggered"
+    assert _wait_for(lambda: feedback._speaker["started"] is not None)
+
+    # "step" is being spoken; "curb" waits and is then replaced by "object"
+    assert feedback.trigger_feedback("curb", "Sound Only")["status"] == "triggered"
+    assert feedback.trigger_feedback("object", "Sound Only")["status"] == "triggered"
+
+    feedback.tts.gate.set()
+    assert _wait_for(lambda: len(feedback.tts.spoken) == 2)
+    time.sleep(0.1)
+    assert feedback.tts.spoken == ["Caution. Step ahead.", "Obstacle detected."]
+    assert sum(t.name == "feedback-tts" for t in threading.enumerate()) == 1
+
+
+def test_hung_engine_reports_dropped_and_keeps_cooldown(feedback, monkeypatch):
+    monkeypatch.setattr(feedback, "SPEECH_TIMEOUT", 0.1)
+
+    assert feedback.trigger_feedback("step", "Sound Only")["status"] == "triggered"
+    assert _wait_for(lambda: feedback._speaker["started"] is not None)
+    hung = feedback._speaker
+    time.sleep(0.2)
+
+    result = feedback.trigger_feedback("curb", "Sound Only")
+    assert result["status"] == "dropped"
+    assert result["message"] == "Curb detected."
+    assert feedback._last_triggered_label == "step"  # cooldown not committed
+
+    # the stuck thread is replaced and the retry goes to the new one
+    assert feedback._speaker is not hung
+    assert feedback.trigger_feedback("curb", "Sound Only")["status"] == "triggered"
+    assert _wait_for(lambda: "Curb detected." in feedback.tts.spoken)
@@ -0,0 +1,136 @@
+import sys
+import types
+import tracemalloc
+
+import pytest
+
+from modules import memory
+from modules.memory import MemoryMonitor, shed_level
+
+
+def test_shed_level_rises_immediately():
+    assert shed_level(0.50, 0) == 0
+    assert shed_level(0.85, 0) == 1
+    assert shed_level(0.96, 0) == 2
+    assert shed_level(0.96, 1) == 2
+
+
+def test_shed_level_steps_down_with_hysteresis():
+    level = shed_level(0.96, 0)
+    assert level == 2
+
+    # still within 10% of the hard limit: hold level 2
+    assert shed_level(0.90, level) == 2
+
+    # below HARD_LIMIT - margin: 2 -> 1 even though usage is under SOFT_LIMIT
+    level = shed_level(0.75, level)
+    assert level == 1
+    assert shed_level(0.72, level) == 1
+
+    # below SOFT_LIMIT - margin: 1 -> 0
+    assert shed_level(0.65, level) == 0
+
+
+def test_shed_level_large_drop_clears_every_level_at_once():
+    assert shed_level(0.30, 2) == 0
+
+
+def test_monitor_follows_budget():
+    pytest.importorskip("psutil")
+    monitor = MemoryMonitor(budget_mb=100)
+    mb = 1024 * 1024
+    for rss, expected in [(96, 2), (75, 1), (72, 1), (65, 0)]:
+        monitor._rss = rss * mb
+        monitor._update_level()
+        assert monitor._level == expected
+
+
+def test_budget_needs_psutil(monkeypatch):
+    monkeypatch.setattr(memory, "psutil", None)
+    monitor = MemoryMonitor(budget_mb=100)
+    assert monitor.budget_bytes == 0
+    assert monitor.tick()["level"] == 0
+
+
+def test_no_live_rss_disables_shedding(monkeypatch):
+    pytest.importorskip("psutil")
+    monitor = MemoryMonitor(budget_mb=100)
+    monkeypatch.setattr(memory, "rss_bytes", lambda pid=None: None)
+    monitor._last_sample = 0
+    assert monitor.tick()["level"] == 0
+    assert monitor.budget_bytes == 0
+    assert "RSS n/a" in monitor.summary()
+
+
+def test_peak_rss_units(monkeypatch):
+    usage = types.SimpleNamespace(ru_maxrss=2048)
+    fake = types.SimpleNamespace(RUSAGE_SELF=0, getrusage=lambda who: usage)
+    monkeypatch.setitem(sys.modules, "resource", fake)
+
+    monkeypatch.setattr(memory.sys, "platform", "darwin")
+    assert memory.peak_rss_bytes() == 2048         # bytes on macOS
+    monkeypatch.setattr(memory.sys, "platform", "linux")
+    assert memory.peak_rss_bytes() == 2048 * 1024  # KB elsewhere
+
+
+def test_workers_count_by_uss(monkeypatch):
+    pytest.importorskip("psutil")
+    mb = 1024 * 1024
+    pool = types.SimpleNamespace(worker_pids=lambda: [11, 12],
+                                 worker_interpreter_stats=lambda: [])
+    monkeypatch.setattr(memory, "rss_bytes", lambda pid=None: 300 * mb)
+    monkeypatch.setattr(memory, "uss_bytes", lambda pid: 50 * mb)
+
+    monitor = MemoryMonitor(budget_mb=1000)
+    monitor.attach_pool(pool)
+    monitor._last_sample = 0
+    assert monitor.tick()["level"] == 0
+    assert monitor.stats()["rss"] == 400 * mb  # UI RSS + 2 x worker USS
+
+
+def test_stages_nest():
+    monitor = MemoryMonitor(trace=True)
+    try:
+        with monitor.stage("outer"):
+            with monitor.stage("inner"):
+                kept = bytearray(256 * 1024)
+    finally:
+        tracemalloc.stop()
+    stages = monitor.stats()["stages"]
+    assert stages["outer"]["calls"] == stages["inner"]["calls"] == 1
+    assert stages["inner"]["net_last"] >= len(kept)
+    assert stages["outer"]["net_last"] >= len(kept)
+
+
+def test_concurrent_ticks_log_a_level_change_once(monkeypatch):
+    pytest.importorskip("psutil")
+    import logging
+    import threading
+    import time
+
+    mb = 1024 * 1024
+    changes = []
+
+    class SlowHandler(logging.Handler):
+        def emit(self, record):
+            changes.append(record.getMessage())
+            time.sleep(0.01)  # widen the window between deciding and storing a level
+
+    monitor = MemoryMonitor(budget_mb=100)
+    monkeypatch.setattr(memory, "rss_bytes", lambda pid=None: 96 * mb)
+    monkeypatch.setattr(memory, "SAMPLE_INTERVAL", 0.0)
+    monitor._last_sample = 0
+
+    handler = SlowHandler(level=logging.WARNING)
+    memory.logger.addHandler(handler)
+    try:
+        threads = [threading.Thread(target=monitor.tick) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        memory.logger.removeHandler(handler)
+
+    assert monitor.tick()["level"] == 2
+    assert sum("shed level 0 -> 2" in m for m in changes) == 1
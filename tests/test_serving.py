@@ -0,0 +1,172 @@
+import os
+import signal
+import time
+from contextlib import contextmanager
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from modules import serving
+from modules.serving import DetectorPool
+
+
+@pytest.fixture
+def pool():
+    p = DetectorPool(workers=1, slots=2)
+    assert p.wait_ready(timeout=60)
+    yield p
+    p.close()
+
+
+def _frame(h=480, w=640):
+    return np.zeros((h, w, 3), dtype=np.uint8)
+
+
+@contextmanager
+def _stalled(pool):
+    """Freeze every worker so submitted frames stay in flight."""
+    if not hasattr(signal, "SIGSTOP"):
+        pytest.skip("needs SIGSTOP/SIGCONT")
+    pids = pool.worker_pids()
+    for pid in pids:
+        os.kill(pid, signal.SIGSTOP)
+    try:
+        yield
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGCONT)
+            except ProcessLookupError:
+                pass  # killed inside the block
+
+
+def _result_from_worker(pool, session_id, attempts=50):
+    """Submit until a worker (not the failure path) answers."""
+    for _ in range(attempts):
+        if pool.submit(session_id, _frame()):
+            r = pool.poll(session_id, timeout=10)
+            if r is not None and r["worker"] is not None:
+                return r
+        time.sleep(0.05)
+    return None
+
+
+def test_results_keep_flowing_after_repeated_worker_kills(pool, monkeypatch):
+    monkeypatch.setattr(serving, "HEALTH_INTERVAL", 0.01)
+
+    for _ in range(25):
+        old_pid = pool._procs[0].pid
+        pool._procs[0].kill()
+        pool._procs[0].join(timeout=5)
+
+        r = _result_from_worker(pool, "s")
+        assert r is not None, "pool stopped routing results after a restart"
+        assert r["worker"] != old_pid
+
+    assert pool._collector.is_alive()
+
+
+def test_round_trip(pool):
+    assert pool.submit("s", _frame())
+    r = pool.poll("s", timeout=10)
+    assert r is not None
+    assert r["worker"] in pool.worker_pids()
+    assert "error" not in r
+    assert r["latency_ms"] >= 0.0
+    # the slot comes back and nothing is left for the session
+    assert sorted(pool._free_slots) == [0, 1]
+    assert pool.poll("s") is None
+
+
+def test_oversized_frame_is_downscaled_into_slot(pool):
+    shape, _ = pool._fit_shape((1080, 1920, 3))
+    assert shape[0] <= pool.max_shape[0] and shape[1] <= pool.max_shape[1]
+    assert int(np.prod(shape)) <= pool.slot_bytes
+
+    assert pool.submit("s", _frame(1080, 1920))
+    r = pool.poll("s", timeout=10)
+    assert r is not None and r["worker"] is not None
+
+
+def test_oversized_frame_without_cv2(pool, monkeypatch):
+    monkeypatch.setattr(serving, "cv2", None)
+    shape, step = pool._fit_shape((2160, 3840, 3))
+    assert step > 1
+    assert shape == np.zeros((2160, 3840, 3), np.uint8)[::step, ::step].shape
+    assert int(np.prod(shape)) <= pool.slot_bytes
+
+    assert pool.submit("s", _frame(2160, 3840))
+    assert pool.poll("s", timeout=10) is not None
+
+
+def test_back_pressure_when_every_slot_is_busy(pool):
+    with _stalled(pool):
+        assert pool.submit("a", _frame())
+        assert pool.submit("b", _frame())
+        assert not pool.submit("c", _frame())
+    assert pool.poll("a", timeout=10) is not None
+    assert pool.poll("b", timeout=10) is not None
+    assert pool.submit("c", _frame())
+
+
+def test_dispatch_goes_to_least_loaded_worker():
+    p = DetectorPool(workers=2, slots=4)
+    try:
+        assert p.wait_ready(timeout=60)
+        with _stalled(p):
+            for sid in "abcd":
+                assert p.submit(sid, _frame())
+            load = [t["worker"] for t in p._tickets.values()]
+            assert sorted(load) == [0, 0, 1, 1]
+    finally:
+        p.close()
+
+
+def test_unanswered_request_times_out(pool, monkeypatch):
+    monkeypatch.setattr(serving, "RESULT_TIMEOUT", 0.3)
+    monkeypatch.setattr(serving, "HEALTH_INTERVAL", 0.05)
+    with _stalled(pool):
+        assert pool.submit("s", _frame())
+        r = pool.poll("s", timeout=5)
+    assert r is not None
+    assert r["prediction"] is None and r["error"] == "timeout"
+    # the late worker result is swallowed, but its slot is still returned
+    deadline = time.time() + 10
+    while len(pool._free_slots) < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    assert sorted(pool._free_slots) == [0, 1]
+    assert pool.poll("s") is None
+
+
+def test_killed_worker_fails_its_request_and_frees_the_slot(pool, monkeypatch):
+    monkeypatch.setattr(serving, "HEALTH_INTERVAL", 0.01)
+    with _stalled(pool):
+        assert pool.submit("s", _frame())
+        pool._procs[0].kill()
+        pool._procs[0].join(timeout=5)
+    r = pool.poll("s", timeout=5)
+    assert r is not None and r["error"] == "worker died"
+    assert sorted(pool._free_slots) == [0, 1]
+    assert _result_from_worker(pool, "s") is not None
+
+
+def test_forget_drops_pending_results(pool):
+    with _stalled(pool):
+        assert pool.submit("gone", _frame())
+        pool.forget("gone")
+    deadline = time.time() + 10
+    while pool._tickets and time.time() < deadline:
+        time.sleep(0.05)
+    assert pool.poll("gone") is None
+    assert "gone" not in pool._latest
+
+
+def test_ui_process_never_loads_the_model(pool):
+    from modules import vision
+
+    assert pool.submit("s", _frame())
+    raw = pool.poll("s", timeout=10)
+    vision.finalize_prediction(raw["prediction"])
+    assert not vision._model_loaded
+    assert vision._interpreter is None